@@ -1,10 +1,14 @@
+import asyncio
+import numpy as np
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from time import sleep
+import httpx
+import ahocorasick
+import lxml.html
+from lxml import etree
+from itertools import islice
 import logging
-from typing import Dict, List, Optional
-from urllib.parse import urlparse
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urldefrag
 import sys
 
 # Set up logging
@@ -16,25 +20,43 @@ logging.basicConfig(
         logging.FileHandler('seo_analysis.log')
     ]
 )
+# httpx logs every request at INFO; keep only its warnings
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Pages are truncated to this many bytes; the head and main content come well before it
+MAX_BYTES = 2_000_000
+
+# Page elements checked for query presence, in output column order
+PRESENCE_FIELDS = ['Title', 'Meta', 'H1', 'H2-1', 'H2-2', 'H3-1', 'H3-2', 'Body']
+
+# Elements whose contents are never shown as page text
+HIDDEN_TAGS = ['script', 'style', 'noscript', 'template', 'svg']
+
+def get_text(element) -> str:
+    """Join the stripped, non-blank text nodes under an element, separated by spaces."""
+    return " ".join(text for text in map(str.strip, element.itertext()) if text)
 
 class SEOAnalyzer:
-    def __init__(self, csv_path: str, branded_terms: List[str], request_delay: float = 1.0):
+    def __init__(self, csv_path: str, branded_terms: List[str], request_delay: float = 1.0,
+                 max_concurrent: int = 5):
         """
         Initialize the SEO Analyzer.
         
         Args:
             csv_path: Path to the Google Search Console CSV file
             branded_terms: List of branded terms to exclude
-            request_delay: Delay between URL requests in seconds
+            request_delay: Delay before each URL request in seconds
+            max_concurrent: Maximum number of URL requests in flight at once
         """
         self.csv_path = csv_path
-        self.branded_terms = [term.strip().lower() for term in branded_terms]
+        # Blank terms (e.g. from a trailing comma) would match every query
+        self.branded_terms = [term.strip().casefold() for term in branded_terms if term.strip()]
         self.request_delay = request_delay
-        self.session = requests.Session()
-        # Set a reasonable timeout and user agent
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.max_concurrent = max_concurrent
 
     def load_and_filter_data(self) -> pd.DataFrame:
         """Load the CSV file and filter out branded terms."""
@@ -42,10 +64,15 @@ class SEOAnalyzer:
             df = pd.read_csv(self.csv_path)
             logging.info(f"Loaded {len(df)} rows from CSV file")
             
-            # Filter out branded terms
-            pattern = '|'.join(map(lambda x: rf"{x}", self.branded_terms))
-            if pattern:
-                df = df[~df['Query'].str.lower().str.contains(pattern, na=False)]
+            # Case-fold queries once; branded filtering and presence checks both match on this
+            df['_query_cf'] = df['Query'].str.casefold()
+
+            # Filter out branded terms with plain substring checks rather than a regex
+            if self.branded_terms:
+                is_branded = np.zeros(len(df), dtype=bool)
+                for term in self.branded_terms:
+                    is_branded |= df['_query_cf'].str.contains(term, regex=False, na=False).to_numpy()
+                df = df[~is_branded]
                 logging.info(f"Filtered data to {len(df)} rows after removing branded terms")
             
             return df
@@ -53,114 +80,191 @@ class SEOAnalyzer:
             logging.error(f"Error loading CSV file: {e}")
             raise
 
-    def select_top_queries(self, group: pd.DataFrame) -> pd.DataFrame:
+    def select_top_queries(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Select top 8 queries by clicks and top 2 by impressions.
+        Select top 8 queries by clicks and top 2 by impressions for every landing page.
         If less than 8 queries have clicks, fill with top impression queries.
         """
-        # Sort by clicks (descending) and get queries with clicks > 0
-        queries_with_clicks = group[group['Clicks'] > 0].sort_values('Clicks', ascending=False)
-        
-        # Get top 8 by clicks or all if less than 8
-        top_by_clicks = queries_with_clicks.head(8)
-        
-        # Calculate how many more queries we need
-        remaining_slots = 10 - len(top_by_clicks)
-        
-        # Get additional queries by impressions, excluding those already selected
-        if remaining_slots > 0:
-            remaining_queries = group[~group['Query'].isin(top_by_clicks['Query'])]
-            top_by_impressions = remaining_queries.sort_values('Impressions', ascending=False).head(remaining_slots)
-            return pd.concat([top_by_clicks, top_by_impressions])
-        
-        return top_by_clicks
+        # Sort by clicks (descending) and take up to 8 queries with clicks > 0 per page
+        queries_with_clicks = df[df['Clicks'] > 0].sort_values('Clicks', ascending=False, kind='stable')
+        top_by_clicks = queries_with_clicks.groupby('Landing Page', sort=False).head(8)
 
-    def fetch_html_content(self, url: str) -> Optional[BeautifulSoup]:
-        """Fetch HTML content from URL with error handling and rate limiting."""
+        # Rank each page's other queries by impressions, excluding those already selected
+        selected = pd.MultiIndex.from_frame(top_by_clicks[['Landing Page', 'Query']])
+        remaining_queries = df[~pd.MultiIndex.from_frame(df[['Landing Page', 'Query']]).isin(selected)]
+        remaining_queries = remaining_queries.sort_values('Impressions', ascending=False, kind='stable')
+
+        # Fill the slots each page has left out of 10
+        clicks_per_page = top_by_clicks.groupby('Landing Page').size()
+        remaining_slots = 10 - clicks_per_page.reindex(remaining_queries['Landing Page'], fill_value=0).to_numpy()
+        rank = remaining_queries.groupby('Landing Page', sort=False).cumcount().to_numpy()
+        top_by_impressions = remaining_queries[rank < remaining_slots]
+
+        return pd.concat([top_by_clicks, top_by_impressions])
+
+    async def fetch_fields(self, client: httpx.AsyncClient, url: str) -> Optional[Dict[str, str]]:
+        """Fetch and parse HTML content from URL with error handling and rate limiting."""
         try:
-            sleep(self.request_delay)  # Rate limiting
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return BeautifulSoup(response.text, 'html.parser')
-        except requests.exceptions.RequestException as e:
+            await asyncio.sleep(self.request_delay)  # Rate limiting
+            # Stream the body so oversized pages stop downloading at MAX_BYTES
+            async with client.stream('GET', url) as response:
+                response.raise_for_status()
+                content = bytearray()
+                async for chunk in response.aiter_bytes():
+                    content += chunk
+                    if len(content) >= MAX_BYTES:
+                        break
+            return self.parse_html(bytes(content[:MAX_BYTES]), response.charset_encoding)
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
             logging.error(f"Failed to fetch content for URL {url}: {e}")
             return None
 
-    def check_presence(self, soup: BeautifulSoup, query: str) -> Dict[str, bool]:
-        """Check presence of query in various HTML elements."""
-        if not soup:
-            return {tag: False for tag in ['Title', 'Meta', 'H1', 'H2-1', 'H2-2', 'H3-1', 'H3-2', 'Body']}
+    def parse_html(self, content: bytes, charset: Optional[str] = None) -> Dict[str, str]:
+        """
+        Extract the case-folded text of each presence field, empty when the element is missing.
+
+        Without a charset from the Content-Type header, libxml2 detects the encoding
+        from the page's own <meta charset> or XML declaration.
+        """
+        fields = dict.fromkeys(PRESENCE_FIELDS, '')
+        try:
+            parser = lxml.html.HTMLParser(encoding=charset) if charset else None
+        except LookupError:
+            parser = None  # Unknown charset in the header; let libxml2 detect it
+        try:
+            tree = lxml.html.document_fromstring(content, parser=parser)
+        except etree.ParserError:
+            return fields  # Empty document
+
+        # Only visible text counts, and dropping the rest keeps the body text small
+        etree.strip_elements(tree, *HIDDEN_TAGS, with_tail=False)
+
+        title = tree.find('.//title')
+        if title is not None:
+            fields['Title'] = get_text(title)
 
-        query = query.lower()
-        presence = {}
+        meta = tree.find(".//meta[@name='description']")
+        if meta is not None:
+            fields['Meta'] = meta.get('content', '')
 
-        # Check title
-        title = soup.find('title')
-        presence['Title'] = bool(title and query in title.get_text(separator=" ").lower())
+        h1 = tree.find('.//h1')
+        if h1 is not None:
+            fields['H1'] = get_text(h1)
 
-        # Check meta description
-        meta = soup.find('meta', attrs={'name': 'description'})
-        presence['Meta'] = bool(meta and meta.get('content', '').lower().find(query) != -1)
+        # Only the first two H2s and H3s are checked, so stop iterating after them
+        for idx, h2 in enumerate(islice(tree.iter('h2'), 2), 1):
+            fields[f'H2-{idx}'] = get_text(h2)
 
-        # Check H1
-        h1 = soup.find('h1')
-        presence['H1'] = bool(h1 and query in h1.get_text(separator=" ").lower())
+        for idx, h3 in enumerate(islice(tree.iter('h3'), 2), 1):
+            fields[f'H3-{idx}'] = get_text(h3)
 
-        # Check H2s
-        h2s = soup.find_all('h2')
-        presence['H2-1'] = bool(len(h2s) > 0 and query in h2s[0].get_text(separator=" ").lower())
-        presence['H2-2'] = bool(len(h2s) > 1 and query in h2s[1].get_text(separator=" ").lower())
+        body = tree.find('body')
+        if body is not None:
+            fields['Body'] = get_text(body)
 
-        # Check H3s
-        h3s = soup.find_all('h3')
-        presence['H3-1'] = bool(len(h3s) > 0 and query in h3s[0].get_text(separator=" ").lower())
-        presence['H3-2'] = bool(len(h3s) > 1 and query in h3s[1].get_text(separator=" ").lower())
+        # Case-fold once here so matching never has to
+        return {tag: text.casefold() for tag, text in fields.items()}
 
-        # Check body content
-        body = soup.find('body')
-        presence['Body'] = bool(body and query in body.get_text(separator=" ").lower())
+    def build_automaton(self, queries: Iterable[str]) -> ahocorasick.Automaton:
+        """Build an Aho-Corasick automaton matching the case-folded queries."""
+        automaton = ahocorasick.Automaton()
+        for query in queries:
+            automaton.add_word(query, query)
+        automaton.make_automaton()
+        return automaton
 
-        return presence
+    def find_hits(self, automaton: ahocorasick.Automaton, fields: Dict[str, str]) -> Dict[str, Set[str]]:
+        """Find the queries present in each case-folded field with a single pass over its text."""
+        return {tag: {query for _, query in automaton.iter(text)} for tag, text in fields.items()}
+
+    def check_presence(self, hits: Dict[str, Set[str]], query_cf: str) -> Dict[str, bool]:
+        """Check presence of a case-folded query in various HTML elements."""
+        return {tag: query_cf in found for tag, found in hits.items()}
+
+    def analyze_page(self, automaton: ahocorasick.Automaton, queries: List[str],
+                     fields: Dict[str, str]) -> List[Dict[str, bool]]:
+        """Check each case-folded query against a parsed page and return its presence flags."""
+        # Scan each field once for every query in the automaton
+        hits = self.find_hits(automaton, fields)
+        return [self.check_presence(hits, query) for query in queries]
+
+    async def analyze_pages(self, top_queries: pd.DataFrame) -> Tuple[List[int], List[Dict[str, bool]]]:
+        """
+        Fetch and analyze every landing page, keeping at most max_concurrent requests in flight.
+
+        Each page is analyzed as soon as it is fetched, so only its presence flags
+        are kept rather than the text of every page for the whole run. Returns the
+        positions of the analyzed rows in top_queries and their presence flags.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        # Index each landing page's query rows once instead of slicing a DataFrame per page;
+        # sorted so results list pages in URL order
+        queries = top_queries['_query_cf'].tolist()
+        page_rows = top_queries.groupby('Landing Page', sort=True).indices
+
+        # Landing pages differing only by #fragment are the same document, so fetch it once
+        documents: Dict[str, List[int]] = {}
+        for landing_page, positions in page_rows.items():
+            documents.setdefault(urldefrag(landing_page).url, []).extend(positions.tolist())
+        total_urls = len(documents)
+        completed = last_logged = 0
+        # Log progress about every 1% of URLs rather than for each one
+        progress_step = max(1, total_urls // 100)
+
+        # One automaton over the distinct queries of all pages, shared by every page
+        automaton = self.build_automaton(top_queries['_query_cf'].unique())
+
+        async def fetch_and_analyze(client: httpx.AsyncClient, url: str,
+                                    positions: List[int]) -> List[Dict[str, bool]]:
+            nonlocal completed, last_logged
+            async with semaphore:
+                fields = await self.fetch_fields(client, url)
+
+            completed += 1
+            if completed - last_logged >= progress_step or completed == total_urls:
+                last_logged = completed
+                logging.info(f"Processed {completed}/{total_urls} URLs")
+
+            if fields is None:
+                logging.warning(f"Skipping URL due to fetch failure: {url}")
+                return []
+
+            return self.analyze_page(automaton, [queries[position] for position in positions], fields)
+
+        # One pooled HTTP/2 client so pages on the same host share connections
+        limits = httpx.Limits(max_connections=self.max_concurrent)
+        async with httpx.AsyncClient(http2=True, headers=HEADERS, timeout=10,
+                                     follow_redirects=True, limits=limits) as client:
+            results = await asyncio.gather(
+                *(fetch_and_analyze(client, url, positions) for url, positions in documents.items())
+            )
+
+        analyzed_positions, presence = [], []
+        for positions, page_presence in zip(documents.values(), results):
+            if page_presence:
+                analyzed_positions.extend(positions)
+                presence.extend(page_presence)
+        return analyzed_positions, presence
 
     def analyze(self) -> pd.DataFrame:
         """Perform the SEO analysis."""
         df = self.load_and_filter_data()
-        final_data = []
-        total_urls = len(df['Landing Page'].unique())
 
-        for idx, (landing_page, group) in enumerate(df.groupby('Landing Page'), 1):
-            logging.info(f"Processing URL {idx}/{total_urls}: {landing_page}")
-            
-            # Select top performing queries
-            top_queries = self.select_top_queries(group)
-            
-            # Fetch HTML content
-            soup = self.fetch_html_content(landing_page)
-            
-            if not soup:
-                logging.warning(f"Skipping URL due to fetch failure: {landing_page}")
-                continue
-
-            # Analyze each query
-            for _, query_row in top_queries.iterrows():
-                query = query_row['Query']
-                presence = self.check_presence(soup, query)
-                
-                final_data.append({
-                    'URL': landing_page,
-                    'Query': query,
-                    'Clicks': query_row['Clicks'],
-                    'Impressions': query_row['Impressions'],
-                    **presence
-                })
-
-        return pd.DataFrame(final_data)
+        # Select top performing queries
+        top_queries = self.select_top_queries(df)
+        positions, presence = asyncio.run(self.analyze_pages(top_queries))
+
+        # Build the results once from the analyzed rows and their presence flags
+        results = top_queries.iloc[positions][['Landing Page', 'Query', 'Clicks', 'Impressions']]
+        results = results.rename(columns={'Landing Page': 'URL'}).reset_index(drop=True)
+        return pd.concat([results, pd.DataFrame(presence, columns=PRESENCE_FIELDS)], axis=1)
 
 def main():
     # Get input from user
     csv_path = input("Enter the path to your Google Search Console CSV file: ")
     branded_terms_input = input("Enter branded terms to exclude (comma-separated): ")
-    branded_terms = [term.strip() for term in branded_terms_input.split(",")]
+    branded_terms = [term.strip() for term in branded_terms_input.split(",") if term.strip()]
 
     try:
         # Initialize and run analysis